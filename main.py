@@ -1,167 +1,723 @@
 import streamlit as st
-import yfinance as yf
-import requests
-from bs4 import BeautifulSoup
-from groq import Groq
 import os
-import pandas as pd
-import json 
+import asyncio
+import hashlib
+import json
+import shutil
+import string
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# yfinance, pandas, requests, aiohttp, bs4, orjson and groq are imported where they are used, so the
+# sidebar renders without paying for them until a stock is actually analysed.
+
+GROQ_API_KEY_SET = bool(os.environ.get("GROQ_API_KEY"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_groq_client():
+    """
+    Builds the Groq client once per process, so its HTTP connection pool survives Streamlit reruns.
+    Returns None if no API key is configured.
+    """
+    key = os.environ.get("GROQ_API_KEY")
+    if not key:
+        return None
+    import httpx
+    from groq import Groq
+
+    return Groq(
+        api_key=key,
+        # HTTP/2 multiplexes concurrent streamed completions over one TCP+TLS connection.
+        http_client=httpx.Client(http2=True, limits=httpx.Limits(max_connections=8, max_keepalive_connections=4)),
+    )
+
+
+UA_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+}
+# "price" carries symbol and name; the batch quote overrides them when it is available, but it may not be.
+QUOTE_SUMMARY_MODULES = "price,summaryDetail,assetProfile,defaultKeyStatistics,financialData"
+HISTORY_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+_CACHE_DIR = Path(tempfile.gettempdir()) / "yf_cache"
+# How long a ticker's fetched data is reused, both in memory and on disk.
+STOCK_DATA_TTL = 900
+# Part of every disk-cache file name; bump it whenever the shape of stock_data changes.
+DISK_CACHE_VERSION = 2
+# Live quotes go stale within minutes; search results are kept for the default hour.
+HTTP_CACHE_EXPIRY = {
+    "query2.finance.yahoo.com/v7/finance/quote*": 300,
+    "*": 3600,
+}
+QUOTE_BATCH_SIZE = 10
+# After a failed crumb fetch, fetches go straight to the yfinance fallback for this long.
+YAHOO_CREDENTIALS_RETRY_AFTER = 300
+WEB_SNIPPET_MAX_CHARS = 600
+SEARCH_MAX_CONCURRENCY = 8
+# Tickers fetched at once by fetch_stock_data_batch; each fetch runs on the worker thread itself.
+FETCH_MAX_CONCURRENCY = 8
+RELEVANT_INFO_KEYS = (
+    'symbol', 'longName', 'sector', 'industry', 'country', 'website',
+    'marketCap', 'enterpriseValue', 'trailingPE', 'forwardPE', 
+    'dividendYield', 'beta', '52WeekChange', 'shortRatio',
+    'currentPrice', 'targetHighPrice', 'targetLowPrice', 'targetMeanPrice',
+    'recommendationKey', 'numberOfAnalystOpinions'
+)
+_BRIEF_INFO_DEFAULTS = dict.fromkeys(RELEVANT_INFO_KEYS, 'N/A')
+# Prompt tables are serialised as compact CSV with three significant figures.
+PROMPT_FLOAT_FORMAT = "%.3g"
+STATEMENT_FALLBACK_MAX_ROWS = 20
+# Headline rows summarised from each quarterly statement.
+STATEMENT_ROWS = {
+    "income_statement_quarterly": ["Total Revenue", "Net Income"],
+    "balance_sheet_quarterly": ["Total Assets", "Total Debt"],
+    "cash_flow_quarterly": ["Operating Cash Flow"],
+}
+# brief_info fields taken straight from the batch quote, in preference to the (longer-cached) quoteSummary.
+QUOTE_TO_INFO_KEYS = {
+    "symbol": "symbol",
+    "longName": "longName",
+    "regularMarketPrice": "currentPrice",
+    "marketCap": "marketCap",
+    "trailingPE": "trailingPE",
+    "forwardPE": "forwardPE",
+}
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    """
+    Builds the HTTP session shared by the hand-rolled requests-based calls: Yahoo's crumb and quote endpoints and web search.
+    yfinance is not given it: recent releases reject caching sessions and use their own curl_cffi one.
+    Connections are kept alive across calls, GET responses are cached on disk, and
+    throttled or failed requests are retried with exponential backoff.
+    Held in st.cache_resource because Streamlit re-executes this module on every rerun.
+    """
+    import requests_cache
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests_cache.CachedSession(
+        "yf_cache",
+        backend="sqlite",
+        expire_after=3600,
+        urls_expire_after=HTTP_CACHE_EXPIRY,
+        allowable_methods=("GET", "POST"),
+    )
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(UA_HEADERS)
+    return session
+
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _get_yahoo_credentials():
+    """
+    Fetches the cookie/crumb pair Yahoo requires on its query2 API endpoints.
+    Raises rather than returning a bad crumb, since whatever is returned is kept for the full TTL.
+    """
+    import requests
+
+    session = get_http_session()
+    # A cached cookie/crumb pair would go stale independently of the one cached here.
+    with session.cache_disabled():
+        response = session.get("https://fc.yahoo.com", allow_redirects=True, timeout=10)
+        cookie = requests.utils.dict_from_cookiejar(response.cookies)
+        crumb_response = session.get("https://query2.finance.yahoo.com/v1/test/getcrumb", cookies=cookie, timeout=10)
+    crumb_response.raise_for_status()
+    crumb = crumb_response.text.strip()
+    # A throttled or rejected request can still come back 200 with an HTML or empty body.
+    if not crumb or "<" in crumb or any(c.isspace() for c in crumb):
+        raise ValueError(f"Yahoo returned an invalid crumb: {crumb[:80]!r}")
+    return {"cookie": cookie, "crumb": crumb}
+
+
+async def _fetch_quote_summary(session, ticker_symbol, credentials):
+    """
+    Fetches only the quoteSummary modules backing the info fields we use, flattened into a
+    stock.info-style dict of plain values.
+    """
+    import aiohttp
+
+    async with session.get(
+        f"https://query2.finance.yahoo.com/v10/finance/quoteSummary/{ticker_symbol}",
+        params={"modules": QUOTE_SUMMARY_MODULES, "crumb": credentials["crumb"]},
+        cookies=credentials["cookie"],
+        headers=UA_HEADERS,
+        timeout=aiohttp.ClientTimeout(total=10),
+    ) as response:
+        response.raise_for_status()
+        payload = await response.json()
+    results = (payload.get("quoteSummary") or {}).get("result")
+    if not results:
+        raise ValueError(f"quoteSummary returned no result for {ticker_symbol}")
+    result = results[0]
+
+    info = {}
+    for module in result.values():
+        for key, value in module.items():
+            # Numeric fields come back as {"raw": 123.4, "fmt": "123.40"}.
+            info[key] = value.get("raw", value.get("fmt")) if isinstance(value, dict) else value
+    return info
+
+
+@st.cache_resource(show_spinner=False)
+def _get_credentials_failure():
+    """
+    Process-wide record of when fetching the Yahoo crumb last failed.
+    """
+    return {"at": 0.0}
 
 
-try:
-    client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-    GROQ_API_KEY_SET = bool(os.environ.get("GROQ_API_KEY"))
-except Exception as e:
-    st.error(f"Error initializing Groq client: {e}. Is GROQ_API_KEY set?")
-    GROQ_API_KEY_SET = False
-    client = None
+async def _fetch_info(session, stock, ticker_symbol, notices):
+    """
+    Fetches the info fields through the targeted quoteSummary call, falling back to yfinance's full
+    get_info. Yahoo may reject or throttle the hand-rolled, non-browser client; yfinance's own
+    session is built to get through. Only network, HTTP and malformed-response errors trigger the
+    fallback, and each use of it is reported through notices.
+    """
+    import aiohttp
+    import requests
 
+    failure = _get_credentials_failure()
+    if time.time() - failure["at"] < YAHOO_CREDENTIALS_RETRY_AFTER:
+        # Not retried on every fetch: each attempt runs the session's full retry backoff first.
+        reason = "the Yahoo crumb could not be fetched recently"
+    else:
+        try:
+            credentials = await asyncio.to_thread(_get_yahoo_credentials)
+        except (requests.RequestException, ValueError) as e:
+            failure["at"] = time.time()
+            reason = f"could not fetch the Yahoo crumb: {e}"
+        else:
+            try:
+                return await _fetch_quote_summary(session, ticker_symbol, credentials)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+                reason = f"quoteSummary failed: {e}"
+    notices.append(("info", f"Loaded the full yfinance info for {ticker_symbol} instead ({reason})."))
+    return await asyncio.to_thread(stock.get_info)
 
 
-def fetch_stock_data(ticker_symbol):
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_quote_batch(symbols):
     """
-    Fetches stock data from Yahoo Finance.
-    Returns a dictionary with various stock details or None if an error occurs.
+    Fetches live quotes for several tickers through Yahoo's multi-symbol quote endpoint,
+    QUOTE_BATCH_SIZE symbols per request. Returns a dict of quote dicts keyed by symbol.
+    """
+    session = get_http_session()
+    credentials = _get_yahoo_credentials()
+    quotes = {}
+    for start in range(0, len(symbols), QUOTE_BATCH_SIZE):
+        response = session.get(
+            "https://query2.finance.yahoo.com/v7/finance/quote",
+            params={"symbols": ",".join(symbols[start:start + QUOTE_BATCH_SIZE]), "crumb": credentials["crumb"]},
+            cookies=credentials["cookie"],
+            timeout=10,
+        )
+        response.raise_for_status()
+        for quote in response.json()["quoteResponse"]["result"]:
+            quotes[quote["symbol"]] = quote
+    return quotes
+
+
+def fetch_quotes(symbols):
+    """
+    Fetches live quotes for a list of tickers in as few requests as possible.
+    Returns a dict keyed by symbol, or None if the quote endpoint is unavailable.
     """
     try:
-        stock = yf.Ticker(ticker_symbol)
-        
-       
-        info = stock.info
-        
-        for key, value in info.items():
-            if isinstance(value, list) and value and isinstance(value[0], dict):
-                try:
-                    json.dumps(value) 
-                except TypeError:
-                    info[key] = str(value) 
-            elif not isinstance(value, (str, int, float, bool, type(None))):
-                
-                try:
-                    json.dumps({key: value})
-                except TypeError:
-                    info[key] = str(value)
-
-
-        hist_1y = stock.history(period="1y")
-        
-        major_holders = None
-        try:
-            major_holders_df = stock.major_holders
-            if major_holders_df is not None and not major_holders_df.empty:
-                major_holders = major_holders_df.to_string()
-        except Exception as e:
-            st.warning(f"Could not fetch major holders for {ticker_symbol}: {e}")
-            major_holders = "Not available or error fetching."
+        return _fetch_quote_batch(tuple(symbols))
+    except Exception as e:
+        st.warning(f"Could not fetch batch quotes for {', '.join(symbols)}: {e}")
+        return None
 
-        recommendations = None
-        try:
-            recommendations_df = stock.recommendations
-            if recommendations_df is not None and not recommendations_df.empty:
-                recommendations = recommendations_df.tail().to_string() 
-            else:
-                recommendations = "No recommendations data available."
-        except Exception as e:
-            st.warning(f"Could not fetch recommendations for {ticker_symbol}: {e}")
-            recommendations = "Not available or error fetching."
 
-        financials_summary = {}
-        try:
-            financials_summary['income_statement_quarterly'] = stock.quarterly_income_stmt.iloc[:, :2].to_string() if stock.quarterly_income_stmt is not None and not stock.quarterly_income_stmt.empty else "Not available"
-            financials_summary['balance_sheet_quarterly'] = stock.quarterly_balance_sheet.iloc[:, :2].to_string() if stock.quarterly_balance_sheet is not None and not stock.quarterly_balance_sheet.empty else "Not available"
-            financials_summary['cash_flow_quarterly'] = stock.quarterly_cashflow.iloc[:, :2].to_string() if stock.quarterly_cashflow is not None and not stock.quarterly_cashflow.empty else "Not available"
-        except Exception as e:
-            st.warning(f"Could not fetch some financial statements for {ticker_symbol}: {e}")
-            if 'income_statement_quarterly' not in financials_summary: financials_summary['income_statement_quarterly'] = "Error fetching."
-            if 'balance_sheet_quarterly' not in financials_summary: financials_summary['balance_sheet_quarterly'] = "Error fetching."
-            if 'cash_flow_quarterly' not in financials_summary: financials_summary['cash_flow_quarterly'] = "Error fetching."
-
-        company_name = info.get('longName', ticker_symbol)
-        sector = info.get('sector', 'N/A')
-        industry = info.get('industry', 'N/A')
-        summary = info.get('longBusinessSummary', 'N/A')
-
-        relevant_info_keys = [
-            'symbol', 'longName', 'sector', 'industry', 'country', 'website',
-            'marketCap', 'enterpriseValue', 'trailingPE', 'forwardPE', 
-            'dividendYield', 'beta', '52WeekChange', 'shortRatio',
-            'currentPrice', 'targetHighPrice', 'targetLowPrice', 'targetMeanPrice',
-            'recommendationKey', 'numberOfAnalystOpinions'
-        ]
-        brief_info = {k: info.get(k, 'N/A') for k in relevant_info_keys}
-
-
-        return {
-            "ticker": ticker_symbol,
-            "company_name": company_name,
-            "info": brief_info, 
-            "full_info_dump_for_display": info, 
-            "sector": sector,
-            "industry": industry,
-            "summary": summary,
-            "history_1y": hist_1y,
-            "major_holders": major_holders,
-            "recommendations": recommendations,
-            "financials_summary": financials_summary
+def drop_unknown_tickers(symbols, quotes):
+    """
+    Reports and removes tickers the batch quote shows to be unknown: Yahoo leaves them out of the
+    response, or returns them without a price. Without quotes nothing can be ruled out, so every
+    symbol is kept and left for the full fetch to reject.
+    """
+    if quotes is None:
+        return symbols
+    known = []
+    for symbol in symbols:
+        if quotes.get(symbol, {}).get("regularMarketPrice") is None:
+            st.error(f"Unknown ticker {symbol}. Please check the ticker symbol and try again.")
+        else:
+            known.append(symbol)
+    return known
+
+
+def _build_brief_info(info):
+    brief_info = {**_BRIEF_INFO_DEFAULTS, **{k: info[k] for k in RELEVANT_INFO_KEYS if k in info}}
+    # Only this whitelist reaches st.json and the prompt, so coerce any non-primitive (e.g. numpy) values here.
+    return {
+        k: v if isinstance(v, (str, int, float, bool, type(None))) else (v.item() if hasattr(v, "item") else str(v))
+        for k, v in brief_info.items()
+    }
+
+
+def _df_to_brief(df, n=5):
+    """
+    Formats the last n rows of a holders/recommendations frame, or None if there is nothing to show.
+    """
+    return df.tail(n).to_csv(float_format=PROMPT_FLOAT_FORMAT) if df is not None and not df.empty else None
+
+
+def _df_to_table(df, rows=slice(None), cols=slice(None)):
+    """
+    Converts the selected part of a frame into a JSON-safe {"index", "columns", "data"} dict for
+    the data tabs, so it survives the disk-cache sidecar; rebuild it with pd.DataFrame(**table).
+    Returns None if there is nothing to show.
+    """
+    if df is None or df.empty:
+        return None
+    df = df.iloc[rows, cols]
+    return {
+        "index": [str(label) for label in df.index],
+        "columns": [label.strftime("%Y-%m-%d") if hasattr(label, "strftime") else str(label) for label in df.columns],
+        "data": df.to_dict(orient="split")["data"],
+    }
+
+
+def _fmt_dict(d):
+    return json.dumps(d, separators=(",", ":"))
+
+
+def _fmt_number(value):
+    # value != value is the NaN check, without a pandas call per cell.
+    return "N/A" if value is None or value != value else PROMPT_FLOAT_FORMAT % value
+
+
+def _statement_to_brief(df, rows):
+    """
+    Formats the headline rows of a quarterly statement for its two most recent quarters as CSV.
+    Falls back to the first STATEMENT_FALLBACK_MAX_ROWS reported rows when none of the headline
+    rows are reported (e.g. for banks).
+    """
+    if df is None or df.empty:
+        return "Not available"
+    # Slice before anything else, so rows empty in both recent quarters are never formatted.
+    df = df.iloc[:, :2].dropna(how='all')
+    periods = df.columns
+    wanted = [row for row in rows if row in df.index] or list(df.index[:STATEMENT_FALLBACK_MAX_ROWS])
+    lines = [",".join(["Item"] + [p.strftime("%Y-%m-%d") if hasattr(p, "strftime") else str(p) for p in periods])]
+    for row in wanted:
+        lines.append(",".join([row] + [_fmt_number(df.at[row, p]) for p in periods]))
+    return "\n".join(lines)
+
+
+def _close_frame(hist_1y):
+    """
+    Returns just the Close column as a float32 single-column frame, the only thing the price chart plots.
+    Built once per fetch so reruns hand st.line_chart a small, ready-made Arrow payload.
+    """
+    if hist_1y.empty:
+        return None
+    return hist_1y['Close'].astype('float32').to_frame()
+
+
+def _disk_cache_paths(ticker_symbol):
+    stem = f"{ticker_symbol}_v{DISK_CACHE_VERSION}_{date.today().isoformat()}"
+    return _CACHE_DIR / f"{stem}.parquet", _CACHE_DIR / f"{stem}.json"
+
+
+def _read_disk_cache(ticker_symbol):
+    """
+    Loads today's on-disk copy of a ticker's data, shared by every session and process on this host.
+    Returns None on a miss, if the copy is older than STOCK_DATA_TTL, or if the files cannot be read.
+    """
+    import pandas as pd
+
+    history_path, sidecar_path = _disk_cache_paths(ticker_symbol)
+    try:
+        # The sidecar is swapped in last, so its mtime is when the copy was completed.
+        if time.time() - sidecar_path.stat().st_mtime > STOCK_DATA_TTL:
+            return None
+        stock_data = json.loads(sidecar_path.read_text())
+        hist_1y = pd.read_parquet(history_path)
+    except Exception:
+        return None
+    stock_data["history_1y"] = hist_1y
+    stock_data["history_close_f32"] = _close_frame(hist_1y)
+    return stock_data
+
+
+def _write_disk_cache(ticker_symbol, stock_data):
+    """
+    Saves the price history as zstd Parquet and everything else as a JSON sidecar, keyed by today's date.
+    Earlier days' files for the ticker are removed. Failures are ignored: the cache is best-effort.
+    """
+    history_path, sidecar_path = _disk_cache_paths(ticker_symbol)
+    sidecar = {k: v for k, v in stock_data.items() if k not in ("history_1y", "history_close_f32")}
+    try:
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        for stale_path in _CACHE_DIR.glob(f"{ticker_symbol}_*"):
+            if stale_path not in (history_path, sidecar_path):
+                stale_path.unlink(missing_ok=True)
+        # Written to temporary names and swapped in, so a concurrent reader never sees a partial file.
+        tmp_history_path = history_path.with_suffix(".parquet.tmp")
+        stock_data["history_1y"].to_parquet(tmp_history_path, compression="zstd")
+        os.replace(tmp_history_path, history_path)
+        tmp_sidecar_path = sidecar_path.with_suffix(".json.tmp")
+        tmp_sidecar_path.write_text(json.dumps(sidecar, default=str))
+        os.replace(tmp_sidecar_path, sidecar_path)
+    except Exception:
+        pass
+
+
+async def _do_fetch(ticker_symbol):
+    """
+    Fetches stock data from Yahoo Finance without touching the Streamlit UI, so the result can be cached.
+    Returns (stock_data, notices), where notices are (level, message) pairs for the UI to show,
+    and raises if the core info or price history cannot be fetched.
+    """
+    import aiohttp
+    import yfinance as yf
+
+    cached = _read_disk_cache(ticker_symbol)
+    if cached is not None:
+        return cached, []
+
+    # Collected rather than emitted: this runs under st.cache_data and the fetches run off the script thread.
+    notices = []
+    stock = yf.Ticker(ticker_symbol)
+
+    # Each accessor is its own round-trip to Yahoo, so fan them all out on one event loop.
+    # yfinance only has a blocking API, so its accessors are pushed onto worker threads.
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=20)) as session:
+        tasks = {
+            "quote_summary": _fetch_info(session, stock, ticker_symbol, notices),
+            "history_1y": asyncio.to_thread(stock.history, period="1y", auto_adjust=False, actions=False),
+            "major_holders": asyncio.to_thread(lambda: stock.major_holders),
+            "recommendations": asyncio.to_thread(lambda: stock.recommendations),
+            "income_statement_quarterly": asyncio.to_thread(lambda: stock.quarterly_income_stmt),
+            "balance_sheet_quarterly": asyncio.to_thread(lambda: stock.quarterly_balance_sheet),
+            "cash_flow_quarterly": asyncio.to_thread(lambda: stock.quarterly_cashflow),
         }
+        values = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    results = {
+        name: (None, value) if isinstance(value, Exception) else (value, None)
+        for name, value in zip(tasks, values)
+    }
+
+    info, info_error = results["quote_summary"]
+    if info_error is not None:
+        raise info_error
+
+    hist_1y, hist_error = results["history_1y"]
+    if hist_error is not None:
+        raise hist_error
+    # Raised rather than returned, so an unknown ticker leaves nothing behind in either cache.
+    if hist_1y.empty and info.get("currentPrice") is None:
+        raise ValueError(f"Unknown ticker {ticker_symbol}")
+    if not hist_1y.empty:
+        hist_1y = hist_1y[HISTORY_COLUMNS].astype({c: "float32" for c in HISTORY_COLUMNS if c != "Volume"})
+    
+    major_holders_df, holders_error = results["major_holders"]
+    if holders_error is not None:
+        notices.append(("warning", f"Could not fetch major holders for {ticker_symbol}: {holders_error}"))
+    major_holders = _df_to_brief(major_holders_df)
+    # The prompt strings are trimmed for the LLM; the Financials tab shows these fuller tables instead.
+    tables = {"major_holders": _df_to_table(major_holders_df)}
+
+    recommendations_df, recommendations_error = results["recommendations"]
+    if recommendations_error is not None:
+        notices.append(("warning", f"Could not fetch recommendations for {ticker_symbol}: {recommendations_error}"))
+    recommendations = _df_to_brief(recommendations_df)
+    tables["recommendations"] = _df_to_table(recommendations_df, rows=slice(-5, None))
+
+    financials_summary = {}
+    for name in ("income_statement_quarterly", "balance_sheet_quarterly", "cash_flow_quarterly"):
+        statement_df, statement_error = results[name]
+        if statement_error is not None:
+            notices.append(("warning", f"Could not fetch some financial statements for {ticker_symbol}: {statement_error}"))
+            financials_summary[name] = "Error fetching."
+            tables[name] = None
+        else:
+            financials_summary[name] = _statement_to_brief(statement_df, STATEMENT_ROWS[name])
+            tables[name] = _df_to_table(statement_df, cols=slice(0, 2))
+
+    info.setdefault('symbol', ticker_symbol)
+    company_name = info.get('longName') or info.get('shortName') or ticker_symbol
+    sector = info.get('sector', 'N/A')
+    industry = info.get('industry', 'N/A')
+    summary = info.get('longBusinessSummary', 'N/A')
+
+    brief_info = _build_brief_info(info)
+
+    stock_data = {
+        "ticker": ticker_symbol,
+        "company_name": company_name,
+        "info": brief_info, 
+        "brief_info_str": _fmt_dict(brief_info),
+        "sector": sector,
+        "industry": industry,
+        "summary": summary,
+        "history_1y": hist_1y,
+        "history_tail_str": hist_1y.tail()[["Close", "Volume"]].to_csv(float_format="%.2f") if not hist_1y.empty else "Not available",
+        "history_close_f32": _close_frame(hist_1y),
+        "major_holders": major_holders,
+        "recommendations": recommendations,
+        "financials_summary": financials_summary,
+        "tables": tables,
+    }
+    # Partial results (anything that produced a warning) are not worth pinning for the rest of the day.
+    if not any(level == "warning" for level, _ in notices):
+        _write_disk_cache(ticker_symbol, stock_data)
+    return stock_data, notices
+
+
+@st.cache_data(ttl=STOCK_DATA_TTL, show_spinner=False)
+def _load_stock_data(ticker_symbol):
+    # st.cache_data holds a per-key lock while computing a miss, so concurrent callers for the
+    # same ticker, from any session, wait for the one fetch instead of starting their own.
+    return asyncio.run(_do_fetch(ticker_symbol))
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_full_info(ticker_symbol):
+    """
+    Fetches the complete (and much larger) yfinance info dict, used only for the raw info view.
+    """
+    import yfinance as yf
+
+    return yf.Ticker(ticker_symbol).get_info()
 
+
+def _present_stock_data(ticker_symbol, load, quote):
+    """
+    Runs a (possibly already finished) load on the script thread: shows its errors and notices,
+    and overlays the live batch-quote fields.
+    """
+    try:
+        stock_data, notices = load()
     except Exception as e:
         st.error(f"Error fetching data for {ticker_symbol} from Yahoo Finance: {e}")
         return None
 
+    for level, message in notices:
+        getattr(st, level)(message)
+
+    if quote:
+        stock_data['info'].update({info_key: quote[quote_key] for quote_key, info_key in QUOTE_TO_INFO_KEYS.items() if quote.get(quote_key) is not None})
+        stock_data['brief_info_str'] = _fmt_dict(stock_data['info'])
+        stock_data['company_name'] = quote.get('longName') or quote.get('shortName') or stock_data['company_name']
+    return stock_data
+
+
+def fetch_stock_data_batch(symbols, quotes=None):
+    """
+    Fetches stock data for one or more tickers from Yahoo Finance, running the per-ticker fetches concurrently.
+    Where a batch quote for a ticker is given, its live price fields override the cached ones.
+    Returns a dict keyed by symbol of stock detail dicts, with None for any ticker that failed.
+    """
+    quotes = quotes or {}
+    with ThreadPoolExecutor(max_workers=min(len(symbols), FETCH_MAX_CONCURRENCY)) as ex:
+        futures = {symbol: ex.submit(_load_stock_data, symbol) for symbol in symbols}
+    # Errors and notices are surfaced here, on the script thread, in input order.
+    return {symbol: _present_stock_data(symbol, fut.result, quotes.get(symbol)) for symbol, fut in futures.items()}
+
+
+def _parse_search_results(html, num_results):
+    """
+    Pulls (title, url, snippet) for the top organic results out of a DuckDuckGo HTML results page.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'lxml')
+    results = []
+    for result in soup.select('div.result:not(.result--ad)'):
+        link = result.select_one('a.result__a')
+        if link is None:
+            continue
+        # DuckDuckGo wraps targets as //duckduckgo.com/l/?uddg=<quoted url>.
+        href = link.get('href', '')
+        url = parse_qs(urlparse(href).query).get('uddg', [href])[0]
+        if not url.startswith('http'):
+            continue
+        snippet = result.select_one('.result__snippet')
+        results.append({
+            "title": link.get_text(strip=True),
+            "url": url,
+            "snippet": snippet.get_text(" ", strip=True) if snippet else "",
+        })
+        if len(results) == num_results:
+            break
+    return results
+
+
+def _extract_page_text(html):
+    """
+    Returns the first few paragraphs of a fetched result page, capped at WEB_SNIPPET_MAX_CHARS,
+    or an empty string if the page has none.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'lxml')
+    # Prefer the article body when the page marks one up, so nav/cookie-banner paragraphs are skipped.
+    body = soup.select_one('article') or soup
+    paragraphs = " ".join(p.get_text(" ", strip=True) for p in body.select('p', limit=3))
+    return paragraphs[:WEB_SNIPPET_MAX_CHARS]
+
+
+async def _fetch_page(session, semaphore, url):
+    async with semaphore:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            return await response.text()
+
+
+async def _fetch_pages(urls):
+    """
+    Fetches result pages concurrently, at most SEARCH_MAX_CONCURRENCY at a time so no single
+    site sees a burst. Returns page bodies (or the exception raised) in the order of urls.
+    """
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(SEARCH_MAX_CONCURRENCY)
+    async with aiohttp.ClientSession(headers=UA_HEADERS, timeout=aiohttp.ClientTimeout(total=10)) as session:
+        return await asyncio.gather(*(_fetch_page(session, semaphore, url) for url in urls), return_exceptions=True)
+
+
 def search_web_for_stock(stock_name, num_results=3):
-    return
+    """
+    Searches DuckDuckGo for recent news about the stock and fetches the top result pages concurrently.
+    Returns a list of Markdown snippets, one per result, and raises if the search itself fails.
+    Makes no Streamlit calls, so it can run on a background thread (see start_web_search).
+    """
+    response = get_http_session().get("https://html.duckduckgo.com/html/", params={"q": f"{stock_name} stock news"}, timeout=10)
+    response.raise_for_status()
+    results = _parse_search_results(response.text, num_results)
 
+    pages = asyncio.run(_fetch_pages([result["url"] for result in results]))
 
-def generate_report_with_llm(stock_data, web_search_results, stock_name, ticker_symbol):
+    snippets = []
+    for result, page in zip(results, pages):
+        text = result["snippet"]
+        if not isinstance(page, Exception):
+            text = _extract_page_text(page) or text
+        snippets.append(f"[{result['title']}]({result['url']})\n\n{text}")
+    return snippets
+
+
+def start_web_search(stock_name, num_results=3):
     """
-    Generates a financial report using Groq API and Llama model.
+    Starts search_web_for_stock on this session's background executor, so the search overlaps
+    with rendering the data tabs. Returns a Future to pass to collect_web_search.
     """
-    if not GROQ_API_KEY_SET or client is None:
-        return "Groq API key not configured. Please set the GROQ_API_KEY environment variable."
+    if "search_executor" not in st.session_state:
+        st.session_state["search_executor"] = ThreadPoolExecutor(max_workers=4)
+    return st.session_state["search_executor"].submit(search_web_for_stock, stock_name, num_results)
 
 
-    
-    stock_summary_for_llm = f"""
-    Company: {stock_data['company_name']} ({ticker_symbol})
-    Sector: {stock_data['sector']}
-    Industry: {stock_data['industry']}
-    Business Summary: {stock_data['summary'][:1000]}... 
-    
-    Key Financial Info (from stock.info):
-    {pd.Series(stock_data['info']).to_string()}
+def collect_web_search(stock_name, future):
+    """
+    Waits for a search started by start_web_search. Returns its snippets, or an empty list if it failed.
+    """
+    try:
+        return future.result()
+    except Exception as e:
+        st.warning(f"Web search failed for {stock_name}: {e}")
+        return []
 
-    Recent Price Trend (Last 5 days of 1-year history):
-    {stock_data['history_1y'].tail().to_string()}
 
-    Major Holders:
-    {stock_data['major_holders']}
+REPORT_TTL_SECONDS = 3600
+PROMPT_BLOCK_MAX_LINES = 40
+# Roughly 800 characters of business summary.
+PROMPT_SUMMARY_MAX_WORDS = 130
 
-    Analyst Recommendations (Recent):
-    {stock_data['recommendations']}
-    
-    Quarterly Financials Summary:
-    Income Statement (Recent 2 Qtrs):
-    {stock_data['financials_summary']['income_statement_quarterly']}
-    
-    Balance Sheet (Recent 2 Qtrs):
-    {stock_data['financials_summary']['balance_sheet_quarterly']}
-    
-    Cash Flow (Recent 2 Qtrs):
-    {stock_data['financials_summary']['cash_flow_quarterly']}
+
+def _cap(text, max_lines=PROMPT_BLOCK_MAX_LINES):
     """
+    Keeps a prompt block to its first max_lines lines, marking any cut with an ellipsis.
+    """
+    if not text:
+        return text
+    lines = text.splitlines()
+    return "\n".join(lines[:max_lines]) + ("\n..." if len(lines) > max_lines else "")
+
+
+def _truncate_words(text, max_words=PROMPT_SUMMARY_MAX_WORDS):
+    words = text.split()
+    return text if len(words) <= max_words else " ".join(words[:max_words]) + "..."
+
 
+@st.cache_resource(show_spinner=False)
+def _get_report_store():
+    """
+    Completed reports keyed by (ticker_symbol, prompt hash), shared across sessions.
+    Filled in as streams finish, since st.cache_data cannot memoize a generator.
+    """
+    return {}
 
 
-    prompt = f"""
-    You are an expert financial analyst. Your task is to generate a comprehensive investment report for {stock_name} ({ticker_symbol}).
+def _stream_report(ticker_symbol, prompt):
+    """
+    Streams the report from Groq chunk by chunk and stores the full text once the stream
+    completes, so an identical prompt is answered without hitting the API again.
+    Failures are reported in-line and never stored.
+    """
+    store = _get_report_store()
+    key = (ticker_symbol, hashlib.sha256(prompt.encode()).hexdigest())
+    cached = store.get(key)
+    if cached is not None and time.time() - cached[0] < REPORT_TTL_SECONDS:
+        yield cached[1]
+        return
+
+    parts = []
+    try:
+        stream = get_groq_client().chat.completions.create(
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a financial analyst AI. Generate reports in Markdown."
+                },
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            model="moonshotai/kimi-k2-instruct",
+            temperature=0.6,
+            stream=True,
+        )
+        for chunk in stream:
+            token = (chunk.choices[0].delta.content or "") if chunk.choices else ""
+            parts.append(token)
+            yield token
+    except Exception as e:
+        st.error(f"Error generating report with Groq API: {e}")
+        yield f"Failed to generate report: {e}"
+        return
+
+    now = time.time()
+    for stale_key, (stored_at, _) in list(store.items()):
+        if now - stored_at >= REPORT_TTL_SECONDS:
+            store.pop(stale_key, None)
+    store[key] = (now, "".join(parts))
+
+
+# Static report instructions, parsed once at import; only the $-slots are filled per report.
+_REPORT_TMPL = string.Template("""
+    You are an expert financial analyst. Your task is to generate a comprehensive investment report for $stock_name ($ticker).
     Use the provided stock data and recent web search information.
 
     **Provided Stock Data:**
-    {stock_summary_for_llm}
+    $stock_summary
 
     **Recent Web Search Snippets/Information:**
-    
+    $web_summary
 
     **Report Requirements (Please structure your report with these sections in Markdown format):**
 
@@ -193,29 +749,176 @@ def generate_report_with_llm(stock_data, web_search_results, stock_name, ticker_
 
     Please generate a detailed and well-structured report in Markdown.
     If some data is "Not available" or "Error fetching", acknowledge it and proceed with the available information.
-    """
+    """)
 
+
+def generate_report_with_llm(stock_data, web_search_results, stock_name, ticker_symbol):
+    """
+    Generates a financial report using Groq API and Llama model.
+    Returns an iterator of Markdown chunks, suitable for st.write_stream.
+    """
     try:
-        st.info("Generating report with LLM... This may take a moment.")
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a financial analyst AI. Generate reports in Markdown."
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="moonshotai/kimi-k2-instruct",
-            temperature=0.6,
-        )
-        report = chat_completion.choices[0].message.content
-        return report
+        client = get_groq_client()
     except Exception as e:
-        st.error(f"Error generating report with Groq API: {e}")
-        return f"Failed to generate report: {e}"
+        st.error(f"Error initializing Groq client: {e}. Is GROQ_API_KEY set?")
+        client = None
+    if client is None:
+        return iter(["Groq API key not configured. Please set the GROQ_API_KEY environment variable."])
+
+
+    
+    stock_summary_for_llm = f"""
+    Company: {stock_data['company_name']} ({ticker_symbol})
+    Sector: {stock_data['sector']}
+    Industry: {stock_data['industry']}
+    Business Summary: {_truncate_words(stock_data['summary'])}
+    
+    Key Financial Info (from stock.info):
+    {stock_data['brief_info_str']}
+
+    Recent Price Trend (Last 5 days of 1-year history):
+    {stock_data['history_tail_str']}
+
+    Major Holders:
+    {_cap(stock_data['major_holders'] or "Not available")}
+
+    Analyst Recommendations (Recent):
+    {_cap(stock_data['recommendations'] or "Not available")}
+    
+    Quarterly Financials Summary:
+    Income Statement (Recent 2 Qtrs):
+    {_cap(stock_data['financials_summary']['income_statement_quarterly'])}
+    
+    Balance Sheet (Recent 2 Qtrs):
+    {_cap(stock_data['financials_summary']['balance_sheet_quarterly'])}
+    
+    Cash Flow (Recent 2 Qtrs):
+    {_cap(stock_data['financials_summary']['cash_flow_quarterly'])}
+    """
+
+
+
+    web_summary_for_llm = _cap("\n\n".join(web_search_results)) if web_search_results else "No web search results available."
+
+    prompt = _REPORT_TMPL.substitute(
+        stock_name=stock_name,
+        ticker=ticker_symbol,
+        stock_summary=stock_summary_for_llm,
+        web_summary=web_summary_for_llm,
+    )
+
+    return _stream_report(ticker_symbol, prompt)
+
+@st.fragment
+def render_full_info(ticker_symbol):
+    """
+    Loads the complete yfinance info dict only when asked. As a fragment, toggling the checkbox
+    reruns just this block instead of the whole analysis.
+    """
+    if st.checkbox("Load full info", key=f"raw_{ticker_symbol}"):
+        import orjson
+
+        try:
+            # orjson serialises the large, numpy-laden dict natively; st.code skips st.json's own encoding pass.
+            full_info_json = orjson.dumps(
+                fetch_full_info(ticker_symbol),
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+                default=str,
+            ).decode()
+            st.code(full_info_json, language="json")
+        except Exception as e:
+            st.error(f"Error fetching full info for {ticker_symbol}: {e}")
+
+
+def render_table(table, fallback="Not available"):
+    """
+    Shows a table built by _df_to_table, or the fallback text when there is none.
+    """
+    if table is None:
+        st.text(fallback)
+        return
+    import pandas as pd
+
+    st.dataframe(pd.DataFrame(**table))
+
+
+def render_stock_analysis(stock_data, web_search_future):
+    """
+    Renders the data tabs, AI report and raw info expander for one fetched ticker.
+    The web search is only waited on once the tabs that do not need it have been drawn.
+    """
+    st.header(f"Analysis for: {stock_data['company_name']} ({stock_data['ticker']})")
+    
+    # Display Stock Data in tabs
+    tab1, tab2, tab3, tab4 = st.tabs(["📊 Company Info & Summary", "📈 Price History", "💰 Financials & Holders", "🌐 Web Search"])
+
+    with tab1:
+        st.subheader("Company Information")
+        st.json(stock_data['info']) # Display the brief info used for LLM
+        st.subheader("Business Summary")
+        st.markdown(stock_data['summary'])
+        st.subheader("Sector & Industry")
+        st.write(f"**Sector:** {stock_data['sector']}")
+        st.write(f"**Industry:** {stock_data['industry']}")
+
+    with tab2:
+        st.subheader("1-Year Stock Price History")
+        if stock_data['history_1y'] is not None and not stock_data['history_1y'].empty:
+            st.line_chart(stock_data['history_close_f32'])
+            st.dataframe(stock_data['history_1y'].tail())
+        else:
+            st.write("Price history not available.")
+    
+    with tab3:
+        tables = stock_data['tables']
+        st.subheader("Quarterly Financials Summary")
+        st.text("Income Statement (Recent):")
+        render_table(tables['income_statement_quarterly'], stock_data['financials_summary']['income_statement_quarterly'])
+        st.text("Balance Sheet (Recent):")
+        render_table(tables['balance_sheet_quarterly'], stock_data['financials_summary']['balance_sheet_quarterly'])
+        st.text("Cash Flow (Recent):")
+        render_table(tables['cash_flow_quarterly'], stock_data['financials_summary']['cash_flow_quarterly'])
+
+        st.subheader("Major Holders")
+        render_table(tables['major_holders'])
+        st.subheader("Analyst Recommendations (Recent)")
+        render_table(tables['recommendations'])
+    
+
+    with tab4:
+        st.subheader("Web Search Results")
+        with st.spinner(f"Searching web for {stock_data['company_name']}..."):
+            web_search_results = collect_web_search(stock_data['company_name'], web_search_future)
+
+        if web_search_results:
+            for i, result in enumerate(web_search_results):
+                st.markdown(f"**Result {i+1}:**")
+                st.markdown(result)
+                st.markdown("---")
+        else:
+            st.write("No web search results to display.")
+
+    st.header("🤖 AI Generated Report")
+    # The streamed text is its own progress indicator, so no spinner here.
+    report_stream = generate_report_with_llm(stock_data, web_search_results, stock_data['company_name'], stock_data['ticker'])
+    st.write_stream(report_stream)
+
+    with st.expander("See Full Raw Stock Info (from yfinance)"):
+        render_full_info(stock_data['ticker'])
+
+
+def clear_caches():
+    """
+    Drops every cached layer (HTTP responses, the Yahoo crumb, memoized fetches, the disk cache and stored reports)
+    so the next analysis goes back to Yahoo and Groq.
+    """
+    get_http_session().cache.clear()
+    _get_yahoo_credentials.clear()
+    _get_credentials_failure.clear()
+    st.cache_data.clear()
+    _get_report_store().clear()
+    shutil.rmtree(_CACHE_DIR, ignore_errors=True)
+
 
 # --- Streamlit App UI ---
 st.set_page_config(layout="wide", page_title="AI Stock Analyzer")
@@ -228,82 +931,52 @@ if not GROQ_API_KEY_SET:
 else:
     st.sidebar.success("Groq API Key loaded.")
 
+if st.sidebar.button("🧹 Clear cache"):
+    clear_caches()
+    st.sidebar.success("Cached data cleared.")
+
 st.sidebar.markdown("---")
 st.sidebar.header("Enter Stock Details")
-ticker_symbol_input = st.sidebar.text_input("Enter Stock Ticker Symbol (e.g., AAPL, MSFT, RELIANCE.NS, BHP.AX):", "AAPL")
+ticker_symbol_input = st.sidebar.text_input("Enter Stock Ticker Symbol(s), comma-separated (e.g., AAPL, MSFT, RELIANCE.NS, BHP.AX):", "AAPL")
 # exchange_name_input = st.sidebar.text_input("Optional: Stock Exchange (e.g., NASDAQ, NSE, LSE):", "") # Future use if ticker mapping is implemented
 
 if st.sidebar.button("🔍 Analyze Stock"):
-    if not ticker_symbol_input:
+    symbols = list(dict.fromkeys(s.strip().upper() for s in ticker_symbol_input.split(",") if s.strip()))
+    if not symbols:
         st.error("Please enter a stock ticker symbol.")
     elif not GROQ_API_KEY_SET:
         st.error("Groq API Key is not configured. Cannot generate report.")
     else:
-        with st.spinner(f"Fetching data for {ticker_symbol_input}..."):
-            stock_data = fetch_stock_data(ticker_symbol_input)
-
-        if stock_data:
-            st.header(f"Analysis for: {stock_data['company_name']} ({stock_data['ticker']})")
-            
-            # Display Stock Data in tabs
-            tab1, tab2, tab3, tab4 = st.tabs(["📊 Company Info & Summary", "📈 Price History", "💰 Financials & Holders", "🌐 Web Search (Simulated)"])
-
-            with tab1:
-                st.subheader("Company Information")
-                st.json(stock_data['info']) # Display the brief info used for LLM
-                st.subheader("Business Summary")
-                st.markdown(stock_data['summary'])
-                st.subheader("Sector & Industry")
-                st.write(f"**Sector:** {stock_data['sector']}")
-                st.write(f"**Industry:** {stock_data['industry']}")
-
-            with tab2:
-                st.subheader("1-Year Stock Price History")
-                if stock_data['history_1y'] is not None and not stock_data['history_1y'].empty:
-                    st.line_chart(stock_data['history_1y']['Close'])
-                    st.dataframe(stock_data['history_1y'].tail())
-                else:
-                    st.write("Price history not available.")
-            
-            with tab3:
-                st.subheader("Quarterly Financials Summary")
-                st.text("Income Statement (Recent):")
-                st.text(stock_data['financials_summary']['income_statement_quarterly'])
-                st.text("Balance Sheet (Recent):")
-                st.text(stock_data['financials_summary']['balance_sheet_quarterly'])
-                st.text("Cash Flow (Recent):")
-                st.text(stock_data['financials_summary']['cash_flow_quarterly'])
-
-                st.subheader("Major Holders")
-                st.text(stock_data['major_holders'])
-                st.subheader("Analyst Recommendations (Recent)")
-                st.text(stock_data['recommendations'])
-            
-        
-            with tab4:
-                st.subheader("Simulated Web Search Results")
-                with st.spinner(f"Searching web for {stock_data['company_name']}..."):
-                  
-                    web_search_results = search_web_for_stock(stock_data['company_name']) 
-                
-                if web_search_results:
-                    for i, result in enumerate(web_search_results):
-                        st.markdown(f"**Result {i+1}:**")
-                        st.markdown(result)
-                        st.markdown("---")
-                else:
-                    st.write("No web search results to display.")
-
-            st.header("🤖 AI Generated Report")
-            with st.spinner("Generating comprehensive report using AI... This might take a few moments."):
-                llm_report = generate_report_with_llm(stock_data, web_search_results, stock_data['company_name'], stock_data['ticker'])
-            
-            st.markdown(llm_report)
-
-            with st.expander("See Full Raw Stock Info (from yfinance)"):
-                st.json(stock_data['full_info_dump_for_display'])
+        with st.spinner(f"Fetching quotes for {', '.join(symbols)}..."):
+            quotes = fetch_quotes(symbols)
+        # Unknown tickers are caught by the one cheap quote request, before any per-ticker fetch starts.
+        symbols = drop_unknown_tickers(symbols, quotes)
+
+        if len(symbols) > 1 and quotes:
+            st.header("Watchlist Overview")
+            overview_columns = ["shortName", "regularMarketPrice", "regularMarketChangePercent", "marketCap", "trailingPE", "forwardPE"]
+            import pandas as pd
+
+            st.dataframe(pd.DataFrame.from_dict(quotes, orient="index").reindex(index=symbols, columns=overview_columns))
+
+        if symbols:
+            with st.spinner(f"Fetching data for {', '.join(symbols)}..."):
+                stock_data_by_symbol = fetch_stock_data_batch(symbols, quotes)
         else:
-            st.error(f"Could not retrieve data for {ticker_symbol_input}. Please check the ticker symbol and try again.")
+            stock_data_by_symbol = {}
+
+        # Every search is kicked off before anything is rendered; each is resolved in its ticker's Web Search tab.
+        web_search_futures = {
+            ticker_symbol: start_web_search(stock_data['company_name'])
+            for ticker_symbol, stock_data in stock_data_by_symbol.items()
+            if stock_data
+        }
+
+        for ticker_symbol, stock_data in stock_data_by_symbol.items():
+            if stock_data:
+                render_stock_analysis(stock_data, web_search_futures[ticker_symbol])
+            else:
+                st.error(f"Could not retrieve data for {ticker_symbol}. Please check the ticker symbol and try again.")
 else:
     st.info("Enter a stock ticker in the sidebar and click 'Analyze Stock' to begin.")
 